@@ -1,21 +1,25 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+import functools
+import hashlib
+import hmac
 import json
-import uuid
 
 # Import your existing database utilities
 from db_utils import (
     init_db, initialize_admin_system, log_flight_search, log_enhanced_flight_search,
-    fetch_recent_searches, fetch_all_searches, log_enhanced_contact, fetch_contacts,
+    fetch_recent_searches, iter_all_searches_csv, log_enhanced_contact, fetch_contacts, load_contacts,
     get_total_searches_count, get_recent_searches_count, get_monthly_searches,
     get_average_trip_duration, get_weekly_growth_rate, get_top_destinations,
     get_top_departures, get_budget_distribution, get_class_distribution,
-    get_searches_over_time, get_flight_analytics, get_admin_summary_stats,
-    generate_analytics_summary, log_event, backup_database, get_database_info
+    get_searches_over_time, get_flight_analytics, load_flight_analytics, get_admin_summary_stats,
+    get_all_kpis, generate_analytics_summary, log_event, backup_database, get_database_info
 )
 
 # Page configuration
@@ -27,7 +31,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+CUSTOM_CSS = """
     <style>
         .main-header {
             background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
@@ -53,24 +57,136 @@ st.markdown("""
             margin-bottom: 1rem;
         }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+def _inject_css():
+    """Emit the stylesheet; Streamlit drops elements a rerun doesn't re-emit, so this runs every time"""
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # Initialize session state
 if "admin_logged_in" not in st.session_state:
     st.session_state.admin_logged_in = False
-if "session_id" not in st.session_state:
-    st.session_state.session_id = str(uuid.uuid4())
 
-# Admin credentials (move to environment variables in production)
+# Demo admin credentials; override with an [admins] table in secrets.toml in production
 ADMIN_CREDENTIALS = {
     "admin": "admin@123",
     "manager": "manager@123",
     "Webisdom": "admin@123"
 }
 
+def _hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+@functools.lru_cache(maxsize=1)
+def _admin_password_hashes():
+    """Hash the configured admin passwords once per process"""
+    try:
+        admins = dict(st.secrets["admins"])
+    except (KeyError, FileNotFoundError):
+        admins = ADMIN_CREDENTIALS
+    return {user: _hash_password(password) for user, password in admins.items()}
+
 def check_admin_credentials(username, password):
     """Check if admin credentials are correct"""
-    return username in ADMIN_CREDENTIALS and ADMIN_CREDENTIALS[username] == password
+    expected = _admin_password_hashes().get(username, "")
+    return hmac.compare_digest(expected, _hash_password(password))
+
+# Cached data access: Streamlit reruns the whole script on every widget
+# interaction, so read-only queries are memoized for CACHE_TTL seconds
+CACHE_TTL = 60
+
+# Plotly chart config: interactive, with scroll-wheel zoom
+PLOTLY_CONFIG = {'staticPlot': False, 'scrollZoom': True}
+
+def _fetch_parallel(tasks, max_workers=8):
+    """Run independent queries concurrently; returns (results, errors) keyed by task name"""
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fn): name for name, fn in tasks.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+    return results, errors
+
+@st.cache_data(ttl=CACHE_TTL)
+def _cached_kpis():
+    return get_all_kpis()
+
+@st.cache_data(ttl=CACHE_TTL)
+def _cached_analytics_data():
+    return _fetch_parallel({
+        'top_destinations': lambda: get_top_destinations(10),
+        'top_departures': lambda: get_top_departures(10),
+        'searches_over_time': get_searches_over_time,
+        'budget_distribution': get_budget_distribution,
+    })
+
+# load_* raise on failure, so st.cache_data stores only successful results;
+# the empty-frame fallback is applied outside the cache
+@st.cache_data(ttl=CACHE_TTL)
+def _cached_contacts_frame(limit, search):
+    return load_contacts(limit, search)
+
+def _cached_contacts(limit=100, search=None):
+    try:
+        return _cached_contacts_frame(limit, search)
+    except Exception as e:
+        print(f"Error fetching contacts: {e}")
+        return pd.DataFrame()
+
+@st.cache_data(ttl=CACHE_TTL)
+def _cached_flight_analytics_frame():
+    return load_flight_analytics()
+
+def _cached_flight_analytics():
+    try:
+        return _cached_flight_analytics_frame()
+    except Exception as e:
+        print(f"Error in get_flight_analytics: {e}")
+        return pd.DataFrame()
+
+# Figure builders are cached on their (hashed) input data so warm reruns
+# skip Plotly's trace and layout construction; a constant uirevision keeps
+# zoom/pan across reruns and transition_duration=0 skips redraw animations
+@st.cache_data(ttl=CACHE_TTL)
+def _bar_fig(rows, label, title, cmap):
+    names, counts = zip(*rows)
+    fig = px.bar(x=counts, y=names, orientation='h', title=title, color=counts,
+                 color_continuous_scale=cmap,
+                 labels={'x': 'count', 'y': label, 'color': 'count'})
+    fig.update_layout(height=400, yaxis={'categoryorder':'total ascending'},
+                      uirevision='constant', transition_duration=0)
+    return fig
+
+@st.cache_data(ttl=CACHE_TTL)
+def _line_fig(rows, title):
+    dates, counts = zip(*rows)
+    # WebGL trace: the browser draws it in one pass instead of one SVG node per point
+    fig = go.Figure(go.Scattergl(x=dates, y=counts, mode='lines+markers'))
+    fig.update_layout(height=400, title=title, xaxis_title='date', yaxis_title='count',
+                      uirevision='constant', transition_duration=0)
+    return fig
+
+@st.cache_data(ttl=CACHE_TTL)
+def _pie_fig(counts, title):
+    names, values = zip(*counts)
+    fig = px.pie(values=values, names=names, title=title)
+    fig.update_layout(height=400)
+    return fig
+
+@st.cache_resource
+def _bootstrap_db():
+    """Create the schema once per process instead of on every rerun"""
+    try:
+        init_db()
+        initialize_admin_system()
+        return True
+    except Exception as e:
+        st.error(f"Database initialization error: {e}")
+        return False
 
 def admin_login():
     """Admin login interface"""
@@ -113,201 +229,160 @@ def display_overview_metrics():
     st.markdown("## 📊 Key Performance Indicators")
     
     try:
-        stats = get_admin_summary_stats()
-        total_searches = get_total_searches_count()
-        contacts_df = fetch_contacts()
-        total_contacts = len(contacts_df) if contacts_df is not None and not contacts_df.empty else 0
-        recent_searches = get_recent_searches_count(7)
-        avg_duration = get_average_trip_duration()
+        stats = _cached_kpis()
     except Exception as e:
         st.error(f"Error fetching metrics: {e}")
         stats = {}
-        total_searches = 0
-        total_contacts = 0
-        recent_searches = 0
-        avg_duration = 0
     
     # Main KPIs
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        st.metric("Total Searches", stats.get('total_searches', total_searches))
+        st.metric("Total Searches", stats.get('total_searches', 0))
     with col2:
-        st.metric("Total Contacts", stats.get('total_contacts', total_contacts))
+        st.metric("Total Contacts", stats.get('total_contacts', 0))
     with col3:
-        st.metric("Last 7 Days", stats.get('searches_7d', recent_searches))
+        st.metric("Last 7 Days", stats.get('searches_7d', 0))
     with col4:
         st.metric("Last 24h", stats.get('searches_24h', 0))
     with col5:
-        st.metric("Avg Trip Duration", f"{stats.get('avg_trip_duration', avg_duration):.1f} days")
+        st.metric("Avg Trip Duration", f"{stats.get('avg_trip_duration', 0):.1f} days")
     
     # Additional metrics
     col6, col7, col8, col9 = st.columns(4)
     
     with col6:
-        try:
-            budget_stats = get_budget_distribution()
-            popular_budget = budget_stats[0][0] if budget_stats else "N/A"
-        except:
-            popular_budget = "N/A"
-        st.metric("Popular Budget", popular_budget)
-    
+        st.metric("Popular Budget", stats.get('popular_budget') or "N/A")
     with col7:
-        try:
-            class_stats = get_class_distribution()
-            popular_class = class_stats[0][0] if class_stats else "N/A"
-        except:
-            popular_class = "N/A"
-        st.metric("Popular Class", popular_class)
-    
+        st.metric("Popular Class", stats.get('popular_class') or "N/A")
     with col8:
-        try:
-            monthly_searches = get_monthly_searches()
-        except:
-            monthly_searches = 0
-        st.metric("This Month", monthly_searches)
-    
+        st.metric("This Month", stats.get('monthly_searches', 0))
     with col9:
-        try:
-            weekly_growth = get_weekly_growth_rate()
-        except:
-            weekly_growth = 0
-        st.metric("Weekly Growth", f"{weekly_growth:+.1f}%")
+        st.metric("Weekly Growth", f"{stats.get('weekly_growth', 0):+.1f}%")
 
 def display_analytics_charts():
     """Display analytics charts"""
     st.markdown("## 📈 Analytics & Trends")
     
-    # Get flight data
-    flight_data = get_flight_analytics()
-    
-    if flight_data.empty:
-        st.info("No flight data available for charts.")
-        return
+    data, errors = _cached_analytics_data()
+    if errors:
+        _cached_analytics_data.clear()
     
     # Top destinations and departures
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("### Top Destinations")
-        try:
-            df_destinations = get_top_destinations(10)
-            if df_destinations is not None and not df_destinations.empty:
-                fig = px.bar(df_destinations, x='count', y='destination', orientation='h',
-                           title='Most Popular Destinations', color='count',
-                           color_continuous_scale='viridis')
-                fig.update_layout(height=400, yaxis={'categoryorder':'total ascending'})
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("No destination data available.")
-        except Exception as e:
-            st.error(f"Error loading destination data: {e}")
+        top_destinations = data.get('top_destinations')
+        if 'top_destinations' in errors:
+            st.error(f"Error loading destination data: {errors['top_destinations']}")
+        elif top_destinations:
+            fig = _bar_fig(top_destinations, 'destination',
+                           'Most Popular Destinations', 'viridis')
+            st.plotly_chart(fig, use_container_width=True, config=PLOTLY_CONFIG)
+        else:
+            st.info("No destination data available.")
     
     with col2:
         st.markdown("### Top Departure Cities")
-        try:
-            df_departures = get_top_departures(10)
-            if df_departures is not None and not df_departures.empty:
-                fig = px.bar(df_departures, x='count', y='origin', orientation='h',
-                           title='Most Popular Departure Cities', color='count',
-                           color_continuous_scale='plasma')
-                fig.update_layout(height=400, yaxis={'categoryorder':'total ascending'})
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("No departure data available.")
-        except Exception as e:
-            st.error(f"Error loading departure data: {e}")
+        top_departures = data.get('top_departures')
+        if 'top_departures' in errors:
+            st.error(f"Error loading departure data: {errors['top_departures']}")
+        elif top_departures:
+            fig = _bar_fig(top_departures, 'origin',
+                           'Most Popular Departure Cities', 'plasma')
+            st.plotly_chart(fig, use_container_width=True, config=PLOTLY_CONFIG)
+        else:
+            st.info("No departure data available.")
     
     # Time-based analytics
     col3, col4 = st.columns(2)
     
     with col3:
         st.markdown("### Search Trends Over Time")
-        try:
-            df_time = get_searches_over_time()
-            if df_time is not None and not df_time.empty:
-                df_time['date'] = pd.to_datetime(df_time['date'])
-                fig = px.line(df_time, x='date', y='count', title='Daily Search Volume', markers=True)
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("No search trend data available.")
-        except Exception as e:
-            st.error(f"Error loading search trends: {e}")
+        searches_over_time = data.get('searches_over_time')
+        if 'searches_over_time' in errors:
+            st.error(f"Error loading search trends: {errors['searches_over_time']}")
+        elif searches_over_time:
+            fig = _line_fig(searches_over_time, 'Daily Search Volume')
+            st.plotly_chart(fig, use_container_width=True, config=PLOTLY_CONFIG)
+        else:
+            st.info("No search trend data available.")
     
     with col4:
         st.markdown("### Budget Distribution")
-        if 'budget_preference' in flight_data.columns:
-            budget_dist = flight_data['budget_preference'].value_counts()
-            fig = px.pie(values=budget_dist.values, names=budget_dist.index, 
-                       title='Budget Preference Distribution')
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+        budget_stats = data.get('budget_distribution')
+        if 'budget_distribution' in errors:
+            st.error(f"Error loading budget data: {errors['budget_distribution']}")
+        elif budget_stats:
+            fig = _pie_fig(budget_stats, 'Budget Preference Distribution')
+            st.plotly_chart(fig, use_container_width=True, config=PLOTLY_CONFIG)
+        else:
+            st.info("No budget data available.")
+
+def _fmt_created_at(series):
+    """Format timestamps as 'YYYY-MM-DD HH:MM' without a per-row strftime"""
+    if isinstance(series.dtype, pd.ArrowDtype) and series.dtype.kind == 'M':
+        # Arrow timestamps (fetch_contacts reads Arrow-backed): one pyarrow strftime kernel
+        return series.dt.strftime('%Y-%m-%d %H:%M')
+    if pd.api.types.is_datetime64_dtype(series):
+        text = np.datetime_as_string(series.to_numpy().astype('datetime64[m]'), unit='m')
+        return pd.Series(text, index=series.index).str.replace('T', ' ', regex=False).mask(series.isna())
+    if pd.api.types.is_string_dtype(series):
+        # ISO strings already carry the format; just trim the seconds
+        return series.str.slice(0, 16).str.replace('T', ' ', regex=False)
+    return pd.to_datetime(series, errors='coerce').dt.strftime('%Y-%m-%d %H:%M')
 
 def display_customer_management():
     """Customer management section"""
     st.markdown("## 👥 Customer Management")
-    
-    customers = fetch_contacts(1000)
-    
-    if customers is None or customers.empty:
-        st.info("No customer data available.")
-        return
-    
+    _customer_panel()
+
+@st.fragment
+def _customer_panel():
+    """Filters and table; runs as a fragment so its widgets rerun only this block"""
     # Filters
     col1, col2, col3 = st.columns(3)
     
     with col1:
         search_term = st.text_input("🔍 Search customers", placeholder="Name, email, or phone")
     with col2:
-        show_count = st.selectbox("Show records", [25, 50, 100, "All"])
+        show_count = st.selectbox("Show records", [25, 50, 100, 0],
+                                  format_func=lambda n: "All" if n == 0 else str(n))
     with col3:
         sort_by = st.selectbox("Sort by", ["Registration Date", "Name", "Email"])
     
-    # Apply filters
-    filtered_customers = customers.copy()
+    # Search is applied in SQL, so each term costs one (cached) query
+    customers = _cached_contacts(1000, search_term or None)
     
-    if search_term:
-        mask = (
-            customers['firstName'].str.contains(search_term, case=False, na=False) |
-            customers['secondName'].str.contains(search_term, case=False, na=False) |
-            customers['email'].str.contains(search_term, case=False, na=False) |
-            customers['phone'].str.contains(search_term, case=False, na=False)
-        )
-        filtered_customers = customers[mask]
+    if customers is None or customers.empty:
+        st.info("No customers match your search." if search_term else "No customer data available.")
+        return
     
-    # Limit results
-    if show_count != "All":
-        filtered_customers = filtered_customers.head(show_count)
+    # Limit results (0 means "All")
+    filtered_customers = customers.iloc[:show_count or None]
     
     # Display
     st.markdown(f"### 📊 Customer Records ({len(filtered_customers)} shown)")
     
     if not filtered_customers.empty:
-        display_data = filtered_customers.copy()
-        
-        # Format data for display
-        if 'created_at' in display_data.columns:
-            display_data['Registration Date'] = pd.to_datetime(
-                display_data['created_at'], errors='coerce'
-            ).dt.strftime('%Y-%m-%d %H:%M')
-        
+        # firstName/secondName were created unquoted, so Postgres folds them to lower case
         column_mapping = {
-            'firstName': 'First Name',
-            'secondName': 'Last Name',
+            'firstname': 'First Name',
+            'secondname': 'Last Name',
             'email': 'Email',
-            'phone': 'Phone'
+            'phone': 'Phone',
+            'created_at': 'Registration Date'
         }
         
-        for old_col, new_col in column_mapping.items():
-            if old_col in display_data.columns:
-                display_data[new_col] = display_data[old_col]
+        # Project and rename in one step instead of copying the frame and each column
+        display_data = filtered_customers.loc[:, list(column_mapping)].rename(columns=column_mapping)
         
-        display_columns = list(column_mapping.values())
+        # Format data for display
         if 'Registration Date' in display_data.columns:
-            display_columns.append('Registration Date')
+            display_data['Registration Date'] = _fmt_created_at(display_data['Registration Date'])
         
-        st.dataframe(display_data[display_columns], use_container_width=True)
+        st.dataframe(display_data, use_container_width=True)
 
 def display_system_management():
     """System management section"""
@@ -322,8 +397,11 @@ def display_system_management():
             st.success("✅ Database: Connected")
             st.write(f"**File Size:** {db_info.get('file_size_mb', 'Unknown')} MB")
             
-            for table, count in db_info.get('table_counts', {}).items():
-                st.write(f"• {table}: {count:,} records")
+            # One markdown element for all tables instead of one per table
+            table_lines = "\n".join(f"- {table}: {count:,} records"
+                                    for table, count in db_info.get('table_counts', {}).items())
+            if table_lines:
+                st.markdown(table_lines)
         except Exception as e:
             st.error(f"❌ Database Error: {e}")
     
@@ -332,9 +410,8 @@ def display_system_management():
         
         if st.button("📊 Export Search Data"):
             try:
-                search_data = fetch_all_searches()
-                if search_data is not None and not search_data.empty:
-                    csv = search_data.to_csv(index=False)
+                csv = b"".join(iter_all_searches_csv())
+                if csv:
                     st.download_button(
                         "💾 Download Search Data",
                         csv,
@@ -364,12 +441,11 @@ def display_system_management():
 
 def main():
     """Main application function"""
-    # Initialize database
-    try:
-        init_db()
-        initialize_admin_system()
-    except Exception as e:
-        st.error(f"Database initialization error: {e}")
+    _inject_css()
+    
+    # Initialize database (once per process; retried on the next rerun if it failed)
+    if not _bootstrap_db():
+        _bootstrap_db.clear()
     
     # Check authentication
     if not admin_login():
@@ -399,7 +475,7 @@ def main():
     elif selected_section == "✈️ Flight Management":
         # You can implement flight management display here
         st.markdown("## ✈️ Flight Management")
-        flight_data = get_flight_analytics()
+        flight_data = _cached_flight_analytics()
         if not flight_data.empty:
             st.dataframe(flight_data, use_container_width=True)
         else:
@@ -1,311 +1,707 @@
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
+import psycopg2.sql
 import os
+import atexit
+import csv
+import functools
+import io
+import queue
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 import pandas as pd
+import streamlit as st
 from datetime import datetime, timedelta
+from dotenv import load_dotenv
 import json
 
+load_dotenv()
 
-def get_db_connection():
-    conn = psycopg2.connect(
+# TCP keepalives stop NAT/load balancers from silently dropping idle pooled
+# sockets, which would otherwise force a fresh TLS handshake on next use
+_CONNECTION_OPTIONS = dict(
+    sslmode="require",
+    keepalives=1,
+    keepalives_idle=30,
+    keepalives_interval=10,
+    keepalives_count=3,
+    tcp_user_timeout=10000,
+    application_name="admin_dashboard",
+)
+
+def _connection_params():
+    """Connection kwargs: DATABASE_URL (environment or .env) first, then st.secrets["postgres"]"""
+    dsn = os.getenv("DATABASE_URL")
+    if dsn:
+        return dict(dsn=dsn, **_CONNECTION_OPTIONS)
+    return dict(
         host=st.secrets["postgres"]["host"],
         database=st.secrets["postgres"]["database"],
         user=st.secrets["postgres"]["user"],
         password=st.secrets["postgres"]["password"],
         port=st.secrets["postgres"]["port"],
-        sslmode="require"
+        **_CONNECTION_OPTIONS
     )
+
+
+def get_db_connection():
+    """Open a standalone connection (helpers in this module use the shared pool)"""
+    conn = psycopg2.connect(**_connection_params())
     return conn
 
+# ============= CONNECTION POOL =============
 
-def init_db():
-    """Initialize database with all required tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Flight searches table (PostgreSQL syntax)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS flight_searches (
-        id SERIAL PRIMARY KEY,
-        origin TEXT NOT NULL,
-        destination TEXT NOT NULL,
-        departure_date TEXT NOT NULL,
-        return_date TEXT NOT NULL,
-        duration_days INTEGER,
-        budget_preference TEXT,
-        flight_class TEXT,
-        estimated_price DECIMAL(10,2),
-        search_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        user_session_id TEXT,
-        search_status TEXT DEFAULT 'completed'
-    )
-    ''')
-    
-    # Contacts table (PostgreSQL syntax)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS contacts (
-        id SERIAL PRIMARY KEY,
-        firstName TEXT NOT NULL,
-        secondName TEXT NOT NULL,
-        email TEXT NOT NULL UNIQUE,
-        phone TEXT,
-        source TEXT DEFAULT 'web_form',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        last_interaction TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        status TEXT DEFAULT 'active',
-        notes TEXT
-    )
-    ''')
+# Every helper used to open its own TLS connection; they now borrow one from a
+# process-wide pool, created on first use so importing this module never blocks
+_pool = None
+_pool_lock = threading.Lock()
+
+# psycopg2's pool closes returned connections beyond minconn, so minconn covers
+# the usual concurrent demand: the analytics fan-out (4 queries), the two
+# background jobs and the script thread. Anything above that is reconnected.
+POOL_MIN_CONNECTIONS = 8
+POOL_MAX_CONNECTIONS = 20
+POOL_WAIT_TIMEOUT = 10
+
+# Each thread then keeps the connection it borrowed and reuses it on later calls,
+# skipping the pool's lock; it is returned when the thread goes away. A connection
+# idle for longer than CONNECTION_HEALTHCHECK_AFTER seconds is probed before reuse
+# so server-side idle timeouts don't surface as query errors.
+CONNECTION_HEALTHCHECK_AFTER = 60
+_tls = threading.local()
+
+class _PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which server-side prepared statements it holds"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+def _get_pool():
+    """Return the shared connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS,
+                    connection_factory=_PreparingConnection, **_connection_params()
+                )
+    return _pool
+
+def _getconn(pool):
+    """pool.getconn(), waiting up to POOL_WAIT_TIMEOUT seconds when every connection is out
+
+    ThreadedConnectionPool raises PoolError instead of blocking; threads return
+    their connections as they finish, so a short wait usually clears it.
+    """
+    deadline = time.monotonic() + POOL_WAIT_TIMEOUT
+    while True:
+        try:
+            return pool.getconn()
+        except psycopg2.pool.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+def _discard_thread_conn(pool):
+    """Close this thread's cached connection and forget it"""
+    _tls.finalizer.detach()
+    pool.putconn(_tls.conn, close=True)
+    _tls.conn = None
+
+def _thread_conn(pool):
+    """Return this thread's cached connection, borrowing (or replacing) it as needed"""
+    conn = getattr(_tls, 'conn', None)
+    if conn is not None and (conn.closed or
+                             time.monotonic() - _tls.last_used > CONNECTION_HEALTHCHECK_AFTER):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+        except psycopg2.Error:
+            _discard_thread_conn(pool)
+            conn = None
     
-    # Events/activity log table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS events (
-        id SERIAL PRIMARY KEY,
-        event_type TEXT NOT NULL,
-        event_data TEXT,
-        user_identifier TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        ip_address TEXT,
-        user_agent TEXT
-    )
-    ''')
+    if conn is None:
+        conn = _getconn(pool)
+        _tls.conn = conn
+        _tls.finalizer = weakref.finalize(threading.current_thread(), pool.putconn, conn)
+    _tls.last_used = time.monotonic()
+    return conn
+
+@contextmanager
+def _conn():
+    """Borrow this thread's connection; any open transaction is rolled back on exit"""
+    initialize_admin_system()
+    pool = _get_pool()
     
-    # System metrics table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS system_metrics (
-        id SERIAL PRIMARY KEY,
-        metric_name TEXT NOT NULL,
-        metric_value DECIMAL(10,2) NOT NULL,
-        metric_type TEXT DEFAULT 'counter',
-        recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        additional_data TEXT
-    )
-    ''')
+    if getattr(_tls, 'in_use', False):
+        # Nested use (e.g. while a streaming export is open): take a separate
+        # pooled connection so the two transactions stay apart
+        conn = _getconn(pool)
+        try:
+            yield conn
+        finally:
+            pool.putconn(conn)
+        return
     
-    conn.commit()
-    conn.close()
+    conn = _thread_conn(pool)
+    _tls.in_use = True
+    try:
+        yield conn
+    finally:
+        _tls.in_use = False
+        _tls.last_used = time.monotonic()
+        if conn.closed:
+            _discard_thread_conn(pool)
+        elif conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                _discard_thread_conn(pool)
+
+def _execute_prepared(cursor, name, query, params=()):
+    """Execute a hot statement through a per-connection server-side prepared plan
+
+    query uses $1..$n placeholders; it is PREPAREd the first time this
+    connection sees name, and every call after that only sends EXECUTE. If the
+    server has lost the statement it is prepared again, once; if the server
+    already has one by that name (a pooled backend shared with another client),
+    it is replaced.
+    """
+    conn = cursor.connection
+    execute = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}"
+    if name in conn.prepared:
+        in_transaction = conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        try:
+            cursor.execute(execute, params or None)
+            return
+        except psycopg2.errors.InvalidSqlStatementName:
+            # The server no longer has it (DISCARD ALL, a session reset, a
+            # transaction-mode pooler): forget what we prepared and prepare again.
+            # Retrying needs a rollback, which is only safe if nothing ran before us.
+            conn.prepared.clear()
+            if in_transaction:
+                raise
+            conn.rollback()
+    # Behind a transaction-mode pooler the backend we land on may already hold
+    # this name, prepared by another client connection: replace it. The
+    # savepoint keeps us in the same transaction, and so on the same backend.
+    cursor.execute("SAVEPOINT prepare_statement")
+    try:
+        cursor.execute(f"PREPARE {name} AS {query}")
+    except psycopg2.errors.DuplicatePreparedStatement:
+        cursor.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+        cursor.execute(f"DEALLOCATE {name}")
+        cursor.execute(f"PREPARE {name} AS {query}")
+    cursor.execute("RELEASE SAVEPOINT prepare_statement")
+    conn.prepared.add(name)
+    cursor.execute(execute, params or None)
+
+def _copy_field(value):
+    """CSV field for COPY: None is an unquoted empty field (NULL), anything else is quoted text"""
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+def _copy_rows(cursor, table, columns, rows):
+    """Bulk-load rows with COPY ... FROM STDIN; None values are written as NULL"""
+    # Quoting every value keeps strings that look like the NULL marker (here '') literal
+    buf = io.StringIO()
+    for row in rows:
+        buf.write(','.join(_copy_field(value) for value in row))
+        buf.write('\n')
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+def _rows(cursor, as_df=False):
+    """Fetch a small result as plain tuples, or as a DataFrame when the caller needs one"""
+    rows = cursor.fetchall()
+    if as_df:
+        return pd.DataFrame.from_records(rows, columns=[col.name for col in cursor.description])
+    return rows
+
+# ============= RESULT CACHE =============
+
+# Dashboards re-render every few seconds and re-issue the same aggregates;
+# read-only helpers below are memoized in-process for RESULT_CACHE_TTL seconds,
+# keeping at most RESULT_CACHE_MAXSIZE results
+RESULT_CACHE_TTL = 30
+RESULT_CACHE_MAXSIZE = 512
+
+_result_cache = {}
+_result_cache_lock = threading.Lock()
+
+def _ttl_cached(func):
+    """Memoize func per argument tuple for RESULT_CACHE_TTL seconds (results are shared; don't mutate them)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        with _result_cache_lock:
+            hit = _result_cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        
+        value = func(*args, **kwargs)
+        with _result_cache_lock:
+            # Re-insert at the end: entries share one TTL, so insertion order is
+            # expiry order. Drop expired entries from the front and, if the cache
+            # is still full, the oldest live ones.
+            _result_cache.pop(key, None)
+            while _result_cache:
+                oldest = next(iter(_result_cache))
+                if len(_result_cache) < RESULT_CACHE_MAXSIZE and _result_cache[oldest][0] > now:
+                    break
+                del _result_cache[oldest]
+            _result_cache[key] = (now + RESULT_CACHE_TTL, value)
+        return value
+    return wrapper
+
+def _clear_result_cache():
+    with _result_cache_lock:
+        _result_cache.clear()
+
+# ============= BACKGROUND JOBS =============
+
+_background_jobs = {}
+_background_jobs_lock = threading.Lock()
+
+def _start_periodic(name, interval, job, run_now=False):
+    """Start a daemon thread that runs job every interval seconds (once per process)
+
+    With run_now the first run happens immediately instead of after one interval.
+    """
+    if name in _background_jobs:
+        return
+    with _background_jobs_lock:
+        if name in _background_jobs:
+            return
+        
+        def loop():
+            delay = 0 if run_now else interval
+            while True:
+                time.sleep(delay)
+                delay = interval
+                try:
+                    job()
+                except Exception as e:
+                    print(f"Error in background job {name}: {e}")
+        
+        thread = threading.Thread(target=loop, name=name, daemon=True)
+        thread.start()
+        _background_jobs[name] = thread
+
+# ============= EVENT BATCHING =============
+
+# log_event() only enqueues; a daemon thread writes the queue every
+# EVENT_FLUSH_INTERVAL seconds so bursts of events share one commit
+EVENT_FLUSH_INTERVAL = 2
+EVENT_BATCH_SIZE = 500
+EVENT_COPY_THRESHOLD = 100
+EVENT_MAX_ATTEMPTS = 5  # a batch that fails this many flushes in a row is dropped
+
+_event_queue = queue.Queue()  # items are (failed_attempts, row)
+
+def flush_events():
+    """Write all queued events now; returns the number of events written"""
+    written = 0
+    while True:
+        batch = []
+        while len(batch) < EVENT_BATCH_SIZE:
+            try:
+                batch.append(_event_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return written
+        rows = [row for _, row in batch]
+        
+        try:
+            with _conn() as conn:
+                cursor = conn.cursor()
+                columns = ('event_type', 'event_data', 'user_identifier')
+                if len(rows) >= EVENT_COPY_THRESHOLD:
+                    _copy_rows(cursor, 'events', columns, rows)
+                else:
+                    psycopg2.extras.execute_values(
+                        cursor,
+                        f"INSERT INTO events ({', '.join(columns)}) VALUES %s",
+                        rows,
+                        page_size=EVENT_BATCH_SIZE
+                    )
+                conn.commit()
+            written += len(rows)
+        except Exception as e:
+            # Put the batch back for the next flush; give up on events that keep failing
+            dropped = 0
+            for attempts, row in batch:
+                if attempts + 1 < EVENT_MAX_ATTEMPTS:
+                    _event_queue.put((attempts + 1, row))
+                else:
+                    dropped += 1
+            print(f"Error writing {len(rows)} events ({dropped} dropped after "
+                  f"{EVENT_MAX_ATTEMPTS} attempts, the rest requeued): {e}")
+            return written
+
+atexit.register(flush_events)
+
+# ============= DAILY ROLLUP =============
+
+# flight_searches_daily pre-aggregates searches per day so time-bucket charts
+# scan one row per day/route instead of every search; it is refreshed when the
+# process starts and every ROLLUP_REFRESH_INTERVAL seconds after that
+ROLLUP_REFRESH_INTERVAL = 3600
+
+def refresh_daily_rollup():
+    """Rebuild flight_searches_daily from flight_searches without blocking readers"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY flight_searches_daily")
+        conn.commit()
+
+
+def init_db():
+    """Initialize database with all required tables"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        # Schema already in place: one round trip instead of a dozen DDL statements.
+        # Keep this pointing at the last object created below.
+        cursor.execute("SELECT to_regclass('public.idx_fs_daily_key')")
+        if cursor.fetchone()[0] is not None:
+            return
+        
+        # Flight searches table (PostgreSQL syntax)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS flight_searches (
+            id SERIAL PRIMARY KEY,
+            origin TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            departure_date TEXT NOT NULL,
+            return_date TEXT NOT NULL,
+            duration_days INTEGER,
+            budget_preference TEXT,
+            flight_class TEXT,
+            estimated_price DECIMAL(10,2),
+            search_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_session_id TEXT,
+            search_status TEXT DEFAULT 'completed'
+        )
+        ''')
+        
+        # Contacts table (PostgreSQL syntax)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contacts (
+            id SERIAL PRIMARY KEY,
+            firstName TEXT NOT NULL,
+            secondName TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            phone TEXT,
+            source TEXT DEFAULT 'web_form',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_interaction TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'active',
+            notes TEXT
+        )
+        ''')
+        
+        # Events/activity log table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id SERIAL PRIMARY KEY,
+            event_type TEXT NOT NULL,
+            event_data TEXT,
+            user_identifier TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ip_address TEXT,
+            user_agent TEXT
+        )
+        ''')
+        
+        # System metrics table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS system_metrics (
+            id SERIAL PRIMARY KEY,
+            metric_name TEXT NOT NULL,
+            metric_value DECIMAL(10,2) NOT NULL,
+            metric_type TEXT DEFAULT 'counter',
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            additional_data TEXT
+        )
+        ''')
+        
+        # Indexes for the dashboard's time-range filters and GROUP BYs
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fs_created_at ON flight_searches (created_at DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fs_destination ON flight_searches (destination)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fs_origin ON flight_searches (origin)')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_fs_duration_notnull ON flight_searches (duration_days)
+        WHERE duration_days IS NOT NULL
+        ''')
+        
+        # Daily rollup (refreshed hourly, see refresh_daily_rollup)
+        cursor.execute('''
+        CREATE MATERIALIZED VIEW IF NOT EXISTS flight_searches_daily AS
+        SELECT DATE(created_at) AS d, origin, destination, budget_preference, flight_class,
+               COUNT(*) AS c
+        FROM flight_searches
+        GROUP BY 1, 2, 3, 4, 5
+        ''')
+        # REFRESH ... CONCURRENTLY requires a unique index
+        cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_fs_daily_key
+        ON flight_searches_daily (d, origin, destination, budget_preference, flight_class)
+        ''')
+        
+        conn.commit()
 
 # ============= ORIGINAL FUNCTIONS (Fixed for PostgreSQL) =============
 
 def log_flight_search(origin, destination, departure_date, return_date, 
                      duration_days, budget_preference, flight_class, estimated_price=None):
     """Log flight search"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    INSERT INTO flight_searches 
-    (origin, destination, departure_date, return_date, duration_days, 
-     budget_preference, flight_class, estimated_price)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-    ''', (origin, destination, departure_date, return_date, duration_days,
-          budget_preference, flight_class, estimated_price))
-    
-    conn.commit()
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'log_flight_search', '''
+        INSERT INTO flight_searches 
+        (origin, destination, departure_date, return_date, duration_days, 
+         budget_preference, flight_class, estimated_price)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        ''', (origin, destination, departure_date, return_date, duration_days,
+              budget_preference, flight_class, estimated_price))
+        
+        conn.commit()
+    _clear_result_cache()
+
+def bulk_log_flight_searches(rows):
+    """Log many flight searches (e.g. a CSV replay) in one COPY; returns the number of rows.
+
+    Each row is a tuple in log_flight_search() argument order; estimated_price may be omitted.
+    """
+    rows = [tuple(row) + (None,) * (8 - len(row)) for row in rows]
+    if not rows:
+        return 0
+
+    with _conn() as conn:
+        cursor = conn.cursor()
+        _copy_rows(cursor, 'flight_searches',
+                   ('origin', 'destination', 'departure_date', 'return_date', 'duration_days',
+                    'budget_preference', 'flight_class', 'estimated_price'), rows)
+        conn.commit()
+    _clear_result_cache()
+    return len(rows)
 
 def log_event(event_type, event_data=None, user_identifier=None):
-    """Log system events"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    INSERT INTO events (event_type, event_data, user_identifier)
-    VALUES (%s, %s, %s)
-    ''', (event_type, str(event_data) if event_data else None, user_identifier))
-    
-    conn.commit()
-    conn.close()
+    """Log system events (queued; written in batches by a background thread)"""
+    _event_queue.put((0, (event_type, str(event_data) if event_data else None, user_identifier)))
+    _start_periodic('event-flusher', EVENT_FLUSH_INTERVAL, flush_events)
 
+@_ttl_cached
 def get_total_searches_count():
     """Get total number of flight searches"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) FROM flight_searches")
-    count = cursor.fetchone()[0]
-    
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'count_searches', "SELECT COUNT(*) FROM flight_searches")
+        count = cursor.fetchone()[0]
     return count
 
-def get_top_destinations(limit=10):
-    """Get top destinations by search count"""
-    conn = get_db_connection()
-    
-    query = '''
-    SELECT destination, COUNT(*) as count 
-    FROM flight_searches 
-    GROUP BY destination 
-    ORDER BY count DESC 
-    LIMIT %s
-    '''
-    
-    df = pd.read_sql_query(query, conn, params=[limit])
-    conn.close()
-    return df
+def get_total_contacts_count():
+    """Get total number of CRM contacts"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'count_contacts', "SELECT COUNT(*) FROM contacts")
+        count = cursor.fetchone()[0]
+    return count
 
-def get_top_departures(limit=10):
-    """Get top departure cities by search count"""
-    conn = get_db_connection()
-    
-    query = '''
-    SELECT origin, COUNT(*) as count 
-    FROM flight_searches 
-    GROUP BY origin 
-    ORDER BY count DESC 
-    LIMIT %s
-    '''
-    
-    df = pd.read_sql_query(query, conn, params=[limit])
-    conn.close()
-    return df
+@_ttl_cached
+def get_top_destinations(limit=10, as_df=False):
+    """Get top destinations by search count as (destination, count) rows"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'top_destinations', '''
+        SELECT destination, COUNT(*) as count 
+        FROM flight_searches 
+        GROUP BY destination 
+        ORDER BY count DESC 
+        LIMIT $1
+        ''', (limit,))
+        
+        return _rows(cursor, as_df)
 
-def get_searches_over_time():
-    """Get search counts over time"""
-    conn = get_db_connection()
-    
-    query = '''
-    SELECT DATE(created_at) as date, COUNT(*) as count 
-    FROM flight_searches 
-    GROUP BY DATE(created_at) 
-    ORDER BY date DESC
-    LIMIT 30
-    '''
-    
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+@_ttl_cached
+def get_top_departures(limit=10, as_df=False):
+    """Get top departure cities by search count as (origin, count) rows"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'top_departures', '''
+        SELECT origin, COUNT(*) as count 
+        FROM flight_searches 
+        GROUP BY origin 
+        ORDER BY count DESC 
+        LIMIT $1
+        ''', (limit,))
+        
+        return _rows(cursor, as_df)
+
+@_ttl_cached
+def get_searches_over_time(as_df=False):
+    """Get search counts over time as (date, count) rows (from the hourly daily rollup)"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'searches_over_time', '''
+        SELECT d as date, SUM(c)::bigint as count 
+        FROM flight_searches_daily 
+        GROUP BY d 
+        ORDER BY date DESC
+        LIMIT 30
+        ''')
+        
+        return _rows(cursor, as_df)
+
+# Columns the dashboard shows for a search; internal bookkeeping columns
+# (id, search_timestamp, user_session_id, search_status) are not sent
+_SEARCH_COLUMNS = '''origin, destination, departure_date, return_date, duration_days,
+            budget_preference, flight_class, estimated_price, created_at'''
 
 def fetch_recent_searches(limit=50):
     """Fetch recent flight searches"""
-    conn = get_db_connection()
-    
-    query = '''
-    SELECT * FROM flight_searches 
-    ORDER BY created_at DESC 
-    LIMIT %s
-    '''
-    
-    df = pd.read_sql_query(query, conn, params=[limit])
-    conn.close()
+    with _conn() as conn:
+        query = f'''
+        SELECT {_SEARCH_COLUMNS} FROM flight_searches 
+        ORDER BY created_at DESC 
+        LIMIT %s
+        '''
+        
+        df = pd.read_sql_query(query, conn, params=[limit])
     return df
 
-def fetch_contacts(limit=100):
-    """Fetch contacts from CRM"""
-    conn = get_db_connection()
-    
-    query = '''
-    SELECT * FROM contacts 
-    ORDER BY created_at DESC 
-    LIMIT %s
-    '''
-    
+def load_contacts(limit=100, search=None):
+    """Fetch contacts from CRM, optionally filtered by name, email or phone; raises on failure"""
+    with _conn() as conn:
+        where = ''
+        params = []
+        if search:
+            # One match per row over the joined columns; the term is matched literally
+            where = "WHERE concat_ws('|', firstName, secondName, email, phone) ILIKE %s ESCAPE '\\'"
+            escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params = [f"%{escaped}%"]
+        
+        query = f'''
+        SELECT * FROM contacts 
+        {where}
+        ORDER BY created_at DESC 
+        LIMIT %s
+        '''
+        
+        # Arrow-backed columns: compact string buffers instead of one PyObject per cell
+        return pd.read_sql_query(query, conn, params=params + [limit], dtype_backend='pyarrow')
+
+def fetch_contacts(limit=100, search=None):
+    """Fetch contacts from CRM, optionally filtered by name, email or phone"""
     try:
-        df = pd.read_sql_query(query, conn, params=[limit])
+        return load_contacts(limit, search)
     except Exception as e:
         print(f"Error fetching contacts: {e}")
-        df = pd.DataFrame()
-    
-    conn.close()
-    return df
+        return pd.DataFrame()
 
 # ============= NEW ENHANCED FUNCTIONS (Fixed for PostgreSQL) =============
 
 def get_recent_searches_count(days=7):
     """Get number of searches in last N days"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT COUNT(*) FROM flight_searches 
-    WHERE created_at >= CURRENT_DATE - INTERVAL '%s days'
-    ''', (days,))
-    
-    count = cursor.fetchone()[0]
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        # make_interval keeps one statement text (and plan) for every value of days
+        _execute_prepared(cursor, 'recent_searches_count', '''
+        SELECT COUNT(*) FROM flight_searches 
+        WHERE created_at >= CURRENT_DATE - make_interval(days => $1)
+        ''', (int(days),))
+        
+        count = cursor.fetchone()[0]
     return count
 
 def get_average_trip_duration():
     """Get average trip duration"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT AVG(duration_days) FROM flight_searches WHERE duration_days IS NOT NULL")
-    avg_duration = cursor.fetchone()[0]
-    
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'avg_trip_duration',
+                          "SELECT AVG(duration_days) FROM flight_searches WHERE duration_days IS NOT NULL")
+        avg_duration = cursor.fetchone()[0]
     return float(avg_duration) if avg_duration else 0
 
 def get_budget_distribution():
     """Get budget preference distribution"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT budget_preference, COUNT(*) as count 
-    FROM flight_searches 
-    WHERE budget_preference IS NOT NULL
-    GROUP BY budget_preference 
-    ORDER BY count DESC
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'budget_distribution', '''
+        SELECT budget_preference, COUNT(*) as count 
+        FROM flight_searches 
+        WHERE budget_preference IS NOT NULL
+        GROUP BY budget_preference 
+        ORDER BY count DESC
+        ''')
+        
+        results = cursor.fetchall()
     return results
 
 def get_class_distribution():
     """Get flight class distribution"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT flight_class, COUNT(*) as count 
-    FROM flight_searches 
-    WHERE flight_class IS NOT NULL
-    GROUP BY flight_class 
-    ORDER BY count DESC
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'class_distribution', '''
+        SELECT flight_class, COUNT(*) as count 
+        FROM flight_searches 
+        WHERE flight_class IS NOT NULL
+        GROUP BY flight_class 
+        ORDER BY count DESC
+        ''')
+        
+        results = cursor.fetchall()
     return results
 
 def get_monthly_searches():
     """Get searches for current month"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT COUNT(*) FROM flight_searches 
-    WHERE created_at >= DATE_TRUNC('month', CURRENT_DATE)
-    ''')
-    
-    count = cursor.fetchone()[0]
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'monthly_searches', '''
+        SELECT COUNT(*) FROM flight_searches 
+        WHERE created_at >= DATE_TRUNC('month', CURRENT_DATE)
+        ''')
+        
+        count = cursor.fetchone()[0]
     return count
 
 def get_weekly_growth_rate():
     """Calculate weekly growth rate"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # This week
-    cursor.execute('''
-    SELECT COUNT(*) FROM flight_searches 
-    WHERE created_at >= CURRENT_DATE - INTERVAL '7 days'
-    ''')
-    this_week = cursor.fetchone()[0]
-    
-    # Last week
-    cursor.execute('''
-    SELECT COUNT(*) FROM flight_searches 
-    WHERE created_at >= CURRENT_DATE - INTERVAL '14 days' 
-    AND created_at < CURRENT_DATE - INTERVAL '7 days'
-    ''')
-    last_week = cursor.fetchone()[0]
-    
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        # This week and last week from one pass over the 14-day index range
+        _execute_prepared(cursor, 'weekly_search_counts', '''
+        SELECT 
+            COUNT(*) FILTER (WHERE created_at >= CURRENT_DATE - INTERVAL '7 days') AS this_week,
+            COUNT(*) FILTER (WHERE created_at < CURRENT_DATE - INTERVAL '7 days') AS last_week
+        FROM flight_searches 
+        WHERE created_at >= CURRENT_DATE - INTERVAL '14 days'
+        ''')
+        this_week, last_week = cursor.fetchone()
     
     if last_week == 0:
         return 0
@@ -313,11 +709,7 @@ def get_weekly_growth_rate():
     growth_rate = ((this_week - last_week) / last_week) * 100
     return growth_rate
 
-def fetch_all_searches():
-    """Fetch all flight searches for export"""
-    conn = get_db_connection()
-    
-    query = '''
+_SEARCH_EXPORT_QUERY = '''
     SELECT 
         origin as "Departure City",
         destination as "Destination",
@@ -330,74 +722,81 @@ def fetch_all_searches():
         created_at as "Search Date"
     FROM flight_searches 
     ORDER BY created_at DESC
-    '''
-    
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+'''
+
+def fetch_all_searches():
+    """Fetch all flight searches for export"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_SEARCH_EXPORT_QUERY)
+        return _rows(cursor, as_df=True)
+
+def iter_all_searches_csv(chunksize=10000):
+    """Stream all flight searches as UTF-8 CSV chunks; a server-side cursor keeps memory flat"""
+    with _conn() as conn:
+        # Named cursor: rows stay on the server and arrive chunksize at a time
+        with conn.cursor(name='export_flight_searches') as cursor:
+            cursor.execute(_SEARCH_EXPORT_QUERY)
+            
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator='\n')
+            header_written = False
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                if not header_written:
+                    writer.writerow([col.name for col in cursor.description])
+                    header_written = True
+                writer.writerows(rows)
+                yield buf.getvalue().encode()
+                buf.seek(0)
+                buf.truncate()
 
 def generate_analytics_summary():
     """Generate analytics summary for export"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        # All metrics in one row; LEFT JOINs keep the row when a top-N is empty
+        cursor.execute('''
+        WITH s AS (
+            SELECT COUNT(*) AS total, AVG(duration_days) AS avg_duration FROM flight_searches
+        ), c AS (
+            SELECT COUNT(*) AS total FROM contacts
+        ), td AS (
+            SELECT destination, COUNT(*) AS n FROM flight_searches
+            GROUP BY destination ORDER BY n DESC LIMIT 1
+        ), tor AS (
+            SELECT origin, COUNT(*) AS n FROM flight_searches
+            GROUP BY origin ORDER BY n DESC LIMIT 1
+        ), tb AS (
+            SELECT budget_preference, COUNT(*) AS n FROM flight_searches
+            WHERE budget_preference IS NOT NULL
+            GROUP BY budget_preference ORDER BY n DESC LIMIT 1
+        )
+        SELECT s.total, c.total, td.destination, td.n, tor.origin, tor.n,
+               tb.budget_preference, tb.n, s.avg_duration
+        FROM s CROSS JOIN c
+        LEFT JOIN td ON true
+        LEFT JOIN tor ON true
+        LEFT JOIN tb ON true
+        ''')
+        (total_searches, total_contacts, top_dest, top_dest_n, top_origin, top_origin_n,
+         top_budget, top_budget_n, avg_duration) = cursor.fetchone()
     
     summary_data = []
-    
-    # Total searches
-    cursor.execute("SELECT COUNT(*) FROM flight_searches")
-    total_searches = cursor.fetchone()[0]
     summary_data.append(["Total Flight Searches", total_searches])
-    
-    # Total contacts
-    cursor.execute("SELECT COUNT(*) FROM contacts")
-    total_contacts = cursor.fetchone()[0]
     summary_data.append(["Total CRM Contacts", total_contacts])
-    
-    # Top destination
-    cursor.execute('''
-    SELECT destination, COUNT(*) as count 
-    FROM flight_searches 
-    GROUP BY destination 
-    ORDER BY count DESC 
-    LIMIT 1
-    ''')
-    top_dest = cursor.fetchone()
-    if top_dest:
-        summary_data.append(["Top Destination", f"{top_dest[0]} ({top_dest[1]} searches)"])
-    
-    # Top departure
-    cursor.execute('''
-    SELECT origin, COUNT(*) as count 
-    FROM flight_searches 
-    GROUP BY origin 
-    ORDER BY count DESC 
-    LIMIT 1
-    ''')
-    top_origin = cursor.fetchone()
-    if top_origin:
-        summary_data.append(["Top Departure City", f"{top_origin[0]} ({top_origin[1]} searches)"])
-    
-    # Most popular budget
-    cursor.execute('''
-    SELECT budget_preference, COUNT(*) as count 
-    FROM flight_searches 
-    WHERE budget_preference IS NOT NULL
-    GROUP BY budget_preference 
-    ORDER BY count DESC 
-    LIMIT 1
-    ''')
-    top_budget = cursor.fetchone()
-    if top_budget:
-        summary_data.append(["Most Popular Budget", f"{top_budget[0]} ({top_budget[1]} searches)"])
-    
-    # Average trip duration
-    cursor.execute("SELECT AVG(duration_days) FROM flight_searches WHERE duration_days IS NOT NULL")
-    avg_duration = cursor.fetchone()[0]
+    if top_dest_n:
+        summary_data.append(["Top Destination", f"{top_dest} ({top_dest_n} searches)"])
+    if top_origin_n:
+        summary_data.append(["Top Departure City", f"{top_origin} ({top_origin_n} searches)"])
+    if top_budget_n:
+        summary_data.append(["Most Popular Budget", f"{top_budget} ({top_budget_n} searches)"])
     if avg_duration:
         summary_data.append(["Average Trip Duration", f"{float(avg_duration):.1f} days"])
     
-    conn.close()
-    
     # Convert to DataFrame and then CSV
     df = pd.DataFrame(summary_data, columns=["Metric", "Value"])
     return df.to_csv(index=False)
@@ -408,121 +807,126 @@ def log_enhanced_flight_search(origin, destination, departure_date, return_date,
                              duration_days, budget_preference, flight_class, 
                              estimated_price=None, user_session_id=None):
     """Enhanced flight search logging with session tracking"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    INSERT INTO flight_searches 
-    (origin, destination, departure_date, return_date, duration_days, 
-     budget_preference, flight_class, estimated_price, user_session_id)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ''', (origin, destination, departure_date, return_date, duration_days,
-          budget_preference, flight_class, estimated_price, user_session_id))
-    
-    conn.commit()
-    conn.close()
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        _execute_prepared(cursor, 'log_enhanced_flight_search', '''
+        INSERT INTO flight_searches 
+        (origin, destination, departure_date, return_date, duration_days, 
+         budget_preference, flight_class, estimated_price, user_session_id)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ''', (origin, destination, departure_date, return_date, duration_days,
+              budget_preference, flight_class, estimated_price, user_session_id))
+        
+        conn.commit()
+    _clear_result_cache()
 
 def log_enhanced_contact(firstName, secondName, email, phone, source='web_form'):
-    """Enhanced contact logging with duplicate handling"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
+    """Enhanced contact logging with duplicate handling (True if inserted, False if updated)"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        # Single-statement upsert: no failed INSERT, rollback and second round trip
+        _execute_prepared(cursor, 'upsert_contact', '''
         INSERT INTO contacts (firstName, secondName, email, phone, source)
-        VALUES (%s, %s, %s, %s, %s)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (email) DO UPDATE
+        SET firstName=EXCLUDED.firstName, secondName=EXCLUDED.secondName,
+            phone=EXCLUDED.phone, last_interaction=CURRENT_TIMESTAMP
+        RETURNING (xmax = 0) AS inserted
         ''', (firstName, secondName, email, phone, source))
         
+        inserted = cursor.fetchone()[0]
         conn.commit()
-        return True
-    except psycopg2.IntegrityError:
-        conn.rollback()
-        # Email already exists, update instead
-        cursor.execute('''
-        UPDATE contacts 
-        SET firstName=%s, secondName=%s, phone=%s, last_interaction=CURRENT_TIMESTAMP
-        WHERE email=%s
-        ''', (firstName, secondName, phone, email))
-        conn.commit()
-        return False
-    finally:
-        conn.close()
+    _clear_result_cache()
+    return inserted
 
-def get_flight_analytics():
-    """Get comprehensive flight analytics for admin dashboard"""
-    conn = get_db_connection()
+_ANALYTICS_DATE_PARTS = ['search_date', 'search_month', 'day_of_week', 'hour_of_day']
+
+def load_flight_analytics():
+    """Flight searches from the last 90 days with derived date parts; raises on failure"""
+    with _conn() as conn:
+        query = f'''
+        SELECT {_SEARCH_COLUMNS}
+        FROM flight_searches fs 
+        WHERE fs.created_at >= CURRENT_DATE - INTERVAL '90 days'
+        ORDER BY fs.created_at DESC
+        '''
+        
+        # Arrow-backed columns arrive already typed (timestamp/date32), so
+        # no pd.to_datetime re-parse, and the frame pickles compactly for caching
+        df = pd.read_sql_query(query, conn, dtype_backend='pyarrow')
     
-    query = '''
-    SELECT 
-        fs.*,
-        DATE(fs.created_at) as search_date,
-        TO_CHAR(fs.created_at, 'YYYY-MM') as search_month,
-        EXTRACT(DOW FROM fs.created_at) as day_of_week,
-        EXTRACT(HOUR FROM fs.created_at) as hour_of_day
-    FROM flight_searches fs 
-    WHERE fs.created_at >= CURRENT_DATE - INTERVAL '90 days'
-    ORDER BY fs.created_at DESC
-    '''
+    # Date parts are derived here, vectorized, rather than shipped as four extra columns per row
+    if df.empty:
+        return _empty_flight_analytics()
     
+    ts = df['created_at'].dt
+    df['search_date'] = ts.date
+    df['search_month'] = ts.strftime('%Y-%m')
+    # Arrow integers don't support %, so shift on a (nullable) numpy-backed copy;
+    # Postgres DOW numbering: Sunday = 0
+    df['day_of_week'] = (ts.dayofweek.astype('Int64') + 1) % 7
+    df['hour_of_day'] = ts.hour
+    return df
+
+def _empty_flight_analytics():
+    columns = [col.strip() for col in _SEARCH_COLUMNS.split(',')]
+    return pd.DataFrame(columns=columns + _ANALYTICS_DATE_PARTS)
+
+def get_flight_analytics():
+    """Get comprehensive flight analytics for admin dashboard"""
     try:
-        df = pd.read_sql_query(query, conn)
-        if not df.empty:
-            df['created_at'] = pd.to_datetime(df['created_at'])
-            df['search_date'] = pd.to_datetime(df['search_date'])
+        return load_flight_analytics()
     except Exception as e:
         print(f"Error in get_flight_analytics: {e}")
-        df = pd.DataFrame()
+        return _empty_flight_analytics()
+
+@_ttl_cached
+def _fetch_admin_summary_stats():
+    """Summary statistics for the admin dashboard; raises on failure so errors aren't cached"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        # Every metric in one statement (one round trip); top destinations
+        # this month come back as a JSON array of [destination, count] pairs
+        cursor.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM flight_searches),
+            (SELECT COUNT(*) FROM contacts),
+            (SELECT COUNT(*) FROM flight_searches
+             WHERE created_at >= CURRENT_TIMESTAMP - INTERVAL '1 day'),
+            (SELECT COUNT(*) FROM contacts
+             WHERE created_at >= CURRENT_TIMESTAMP - INTERVAL '1 day'),
+            (SELECT COALESCE(json_agg(json_build_array(destination, count)), '[]'::json)
+             FROM (SELECT destination, COUNT(*) AS count
+                   FROM flight_searches
+                   WHERE created_at >= DATE_TRUNC('month', CURRENT_DATE)
+                   GROUP BY destination
+                   ORDER BY count DESC
+                   LIMIT 5) top),
+            (SELECT AVG(duration_days) FROM flight_searches WHERE duration_days IS NOT NULL)
+        ''')
+        (total_searches, total_contacts, searches_24h, contacts_24h,
+         top_destinations, avg_duration) = cursor.fetchone()
     
-    conn.close()
-    return df
+    stats = {
+        'total_searches': total_searches,
+        'total_contacts': total_contacts,
+        'searches_24h': searches_24h,
+        'contacts_24h': contacts_24h,
+        'top_destinations': [tuple(pair) for pair in top_destinations],
+        'avg_trip_duration': round(float(avg_duration), 1) if avg_duration else 0,
+    }
+    return stats
 
 def get_admin_summary_stats():
     """Get summary statistics for admin dashboard"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    stats = {}
-    
     try:
-        # Total counts
-        cursor.execute("SELECT COUNT(*) FROM flight_searches")
-        stats['total_searches'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM contacts")
-        stats['total_contacts'] = cursor.fetchone()[0]
-        
-        # Recent activity (last 24 hours)
-        cursor.execute("""
-        SELECT COUNT(*) FROM flight_searches 
-        WHERE created_at >= CURRENT_TIMESTAMP - INTERVAL '1 day'
-        """)
-        stats['searches_24h'] = cursor.fetchone()[0]
-        
-        cursor.execute("""
-        SELECT COUNT(*) FROM contacts 
-        WHERE created_at >= CURRENT_TIMESTAMP - INTERVAL '1 day'
-        """)
-        stats['contacts_24h'] = cursor.fetchone()[0]
-        
-        # Top destinations this month
-        cursor.execute("""
-        SELECT destination, COUNT(*) as count 
-        FROM flight_searches 
-        WHERE created_at >= DATE_TRUNC('month', CURRENT_DATE)
-        GROUP BY destination 
-        ORDER BY count DESC 
-        LIMIT 5
-        """)
-        stats['top_destinations'] = cursor.fetchall()
-        
-        # Average trip duration
-        cursor.execute("SELECT AVG(duration_days) FROM flight_searches WHERE duration_days IS NOT NULL")
-        avg_duration = cursor.fetchone()[0]
-        stats['avg_trip_duration'] = round(float(avg_duration), 1) if avg_duration else 0
-        
+        return _fetch_admin_summary_stats()
     except Exception as e:
         print(f"Error in get_admin_summary_stats: {e}")
-        stats = {
+        return {
             'total_searches': 0,
             'total_contacts': 0,
             'searches_24h': 0,
@@ -530,29 +934,86 @@ def get_admin_summary_stats():
             'top_destinations': [],
             'avg_trip_duration': 0
         }
+
+def get_all_kpis():
+    """Get every overview KPI in a single query"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM flight_searches) AS total_searches,
+            (SELECT COUNT(*) FROM contacts) AS total_contacts,
+            (SELECT COUNT(*) FROM flight_searches 
+             WHERE created_at >= CURRENT_DATE - INTERVAL '7 days') AS searches_7d,
+            (SELECT COUNT(*) FROM flight_searches 
+             WHERE created_at >= CURRENT_DATE - INTERVAL '14 days' 
+             AND created_at < CURRENT_DATE - INTERVAL '7 days') AS searches_prev_7d,
+            (SELECT COUNT(*) FROM flight_searches 
+             WHERE created_at >= CURRENT_TIMESTAMP - INTERVAL '1 day') AS searches_24h,
+            (SELECT COUNT(*) FROM flight_searches 
+             WHERE created_at >= DATE_TRUNC('month', CURRENT_DATE)) AS monthly_searches,
+            (SELECT AVG(duration_days) FROM flight_searches 
+             WHERE duration_days IS NOT NULL) AS avg_trip_duration,
+            (SELECT budget_preference FROM flight_searches 
+             WHERE budget_preference IS NOT NULL
+             GROUP BY budget_preference ORDER BY COUNT(*) DESC LIMIT 1) AS popular_budget,
+            (SELECT flight_class FROM flight_searches 
+             WHERE flight_class IS NOT NULL
+             GROUP BY flight_class ORDER BY COUNT(*) DESC LIMIT 1) AS popular_class
+        """)
+        
+        columns = [col[0] for col in cursor.description]
+        kpis = dict(zip(columns, cursor.fetchone()))
     
-    conn.close()
-    return stats
+    avg_duration = kpis['avg_trip_duration']
+    kpis['avg_trip_duration'] = round(float(avg_duration), 1) if avg_duration else 0
+    
+    last_week = kpis['searches_prev_7d']
+    kpis['weekly_growth'] = ((kpis['searches_7d'] - last_week) / last_week) * 100 if last_week else 0
+    return kpis
+
+_initialized = False
+_initializing = False
+_init_lock = threading.RLock()  # re-entrant: init_db() borrows a connection through _conn()
 
 def initialize_admin_system():
-    """Initialize the complete system"""
-    try:
-        init_db()
-        log_event('system_startup', {'timestamp': datetime.now().isoformat()})
-        print("✅ RoamGenie database system initialized successfully!")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not initialize database: {e}")
+    """Initialize the complete system once per process, on first use rather than at import.
+
+    A failed attempt is retried on the next call.
+
+    Set ADMIN_SKIP_INIT=1 to skip it entirely (e.g. scripts and tooling that import this module).
+    """
+    global _initialized, _initializing
+    if _initialized or os.getenv('ADMIN_SKIP_INIT'):
+        return
+    with _init_lock:
+        if _initialized or _initializing:
+            return
+        _initializing = True
+        try:
+            init_db()
+            _start_periodic('rollup-refresher', ROLLUP_REFRESH_INTERVAL, refresh_daily_rollup,
+                            run_now=True)
+            log_event('system_startup', {'timestamp': datetime.now().isoformat()})
+            _initialized = True
+            print("✅ RoamGenie database system initialized successfully!")
+        except Exception as e:
+            # Left uninitialized, so the next connection borrowed retries
+            print(f"⚠️ Warning: Could not initialize database: {e}")
+        finally:
+            _initializing = False
 
 # ============= UTILITY FUNCTIONS (Fixed for PostgreSQL) =============
 
-def get_database_info():
-    """Get database information and statistics"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    info = {}
-    
-    try:
+@_ttl_cached
+def _fetch_database_info():
+    """Database tables, row counts and size; raises on failure so errors aren't cached"""
+    with _conn() as conn:
+        cursor = conn.cursor()
+        
+        info = {}
+        
         # Get table names
         cursor.execute("""
         SELECT table_name FROM information_schema.tables 
@@ -561,33 +1022,31 @@ def get_database_info():
         tables = [row[0] for row in cursor.fetchall()]
         info['tables'] = tables
         
-        # Get row counts for each table
+        # Exact row counts for every table in one statement; names are quoted as identifiers
         table_counts = {}
-        for table in tables:
-            try:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                table_counts[table] = cursor.fetchone()[0]
-            except:
-                table_counts[table] = 0
+        if tables:
+            count_query = psycopg2.sql.SQL(" UNION ALL ").join(
+                psycopg2.sql.SQL("SELECT {}, COUNT(*) FROM {}").format(
+                    psycopg2.sql.Literal(table), psycopg2.sql.Identifier('public', table))
+                for table in tables
+            )
+            cursor.execute(count_query)
+            table_counts = dict(cursor.fetchall())
         info['table_counts'] = table_counts
         
         # Database size (in PostgreSQL)
         cursor.execute("SELECT pg_size_pretty(pg_database_size(current_database()))")
         info['database_size'] = cursor.fetchone()[0]
-        
+    return info
+
+def get_database_info():
+    """Get database information and statistics"""
+    try:
+        return _fetch_database_info()
     except Exception as e:
         print(f"Error getting database info: {e}")
-        info = {'tables': [], 'table_counts': {}, 'database_size': 'Unknown'}
-    
-    conn.close()
-    return info
+        return {'tables': [], 'table_counts': {}, 'database_size': 'Unknown'}
 
 def backup_database():
     """Note: Database backup should be handled at PostgreSQL level"""
     return "Database backup should be handled through Supabase dashboard or pg_dump"
-
-# Initialize on import
-try:
-    initialize_admin_system()
-except Exception as e:
-    print(f"⚠️ Warning: Could not initialize database: {e}")